@@ -1,118 +1,244 @@
 import cv2
 import mediapipe as mp
 import math
+import os
+import queue
+import threading
+import numpy as np
 
 # 初始化姿势检测模型
+# 实时反馈使用 Lite 模型(model_complexity=0);model_complexity=2 仅用于离线批量分析
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose()
+pose = mp_pose.Pose(
+    static_image_mode=False,
+    model_complexity=0,
+    min_detection_confidence=0.4,
+    min_tracking_confidence=0.4,
+    enable_segmentation=False
+)
+
+# 是否优先使用 NVDEC 硬件解码
+USE_HW_DECODE = True
+
+
+# 打开视频,硬件解码不可用(无 NVIDIA GPU 或编码格式不支持)时回退到 CPU 解码
+def open_capture(path):
+    if USE_HW_DECODE:
+        # OpenCV 的 FFmpeg 后端只识别 video_codec 选项,通过它指定 NVDEC 解码器;
+        # 打开后恢复用户原有的设置,不影响 CPU 回退路径
+        saved = os.environ.get('OPENCV_FFMPEG_CAPTURE_OPTIONS')
+        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'video_codec;h264_cuvid'
+        try:
+            cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+        finally:
+            if saved is None:
+                del os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS']
+            else:
+                os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = saved
+        # h264_cuvid 只能解码 H.264;用于其他编码时也可能打开成功但读不出帧,
+        # 因此同时检查编码格式并试读一帧
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC)).to_bytes(4, 'little').decode('latin-1').lower()
+        if cap.isOpened() and fourcc in ('avc1', 'h264') and cap.grab():
+            # 试读的帧需要重新解码,回到视频开头
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return cap
+        cap.release()
+    return cv2.VideoCapture(path)
 
-# 读取视频
-cap = cv2.VideoCapture('badminton_training.mp4')
 
-# 初始化计数器和列表存储运动员坐标
-counter = 0
-coords = []
+# 读取视频
+cap = open_capture('badminton_training.mp4')
 
+# 姿势分析的目标帧率,按源视频帧率计算抽帧间隔
+TARGET_FPS = 10
+src_fps = cap.get(cv2.CAP_PROP_FPS) or TARGET_FPS
+skip = max(1, int(src_fps // TARGET_FPS))
 
-# 定义运动姿势判断函数
-def check_pose(coords):
-    # 设定关键关节点坐标阈值
-    thresholds = {
-        'shoulder': 30,
-        'elbow': 20,
-        'wrist': 15,
-        'hip': 30,
-        'knee': 20,
-        'ankle': 15
-    }
-
-    # 关键点索引
-    keypoints = {
-        'left_shoulder': 11,
-        'right_shoulder': 12,
-        'left_elbow': 13,
-        'right_elbow': 14,
-        'left_wrist': 15,
-        'right_wrist': 16,
-        'left_hip': 23,
-        'right_hip': 24,
-        'left_knee': 25,
-        'right_knee': 26,
-        'left_ankle': 27,
-        'right_ankle': 28
-    }
-
-    # 判断关键点间的距离
-    for key, threshold in thresholds.items():
-        key_parts = key.split('_')
-        left_keypoint = keypoints[f"left_{key_parts[0]}"]
-        right_keypoint = keypoints[f"right_{key_parts[0]}"]
-        if abs(coords[left_keypoint][0] - coords[right_keypoint][0]) > threshold:
-            print(f'{key_parts[0].capitalize()}距离过大，姿势不标准')
-        else:
-            print(f'{key_parts[0].capitalize()}距离正常')
-
+# 初始化计数器
+counter = 0
 
-# 计算运动员移动距离
-def calculate_distance(coords):
-    if len(coords) >= 2:
-        last_frame = coords[-2]
-        current_frame = coords[-1]
-        hip_center_last = [(last_frame[23][0] + last_frame[24][0]) / 2, (last_frame[23][1] + last_frame[24][1]) / 2]
-        hip_center_current = [(current_frame[23][0] + current_frame[24][0]) / 2,
-                              (current_frame[23][1] + current_frame[24][1]) / 2]
-        distance = math.sqrt((hip_center_current[0] - hip_center_last[0]) ** 2 + (
-                hip_center_current[1] - hip_center_last[1]) ** 2)
-        return distance
-    else:
-        return 0
+# 预分配上一帧和当前帧的关节点坐标缓冲区(两槽环形缓冲),后续逻辑只用到 (x, y)
+NUM_LANDMARKS = 33
+prev = np.empty((NUM_LANDMARKS, 2), dtype=np.float32)
+cur = np.empty((NUM_LANDMARKS, 2), dtype=np.float32)
+has_prev = False
 
+# 当前帧各关节点的可见度,仅用于绘制时过滤被遮挡的关节点
+vis = np.empty(NUM_LANDMARKS, dtype=np.float32)
 
-# 循环检测视频中的每一帧
-while cap.isOpened():
-    # 读取帧
-    ret, frame = cap.read()
 
-    # 如果读取帧成功,进行检测
-    if ret:
+# 是否输出逐关节的调试信息
+DEBUG = False
 
-        # 将当前帧发送到Pose检测模型
-        results = pose.process(frame)
+# 是否显示标注后的视频窗口;批量分析时关闭可省去绘制和 GUI 事件处理
+SHOW_WINDOW = True
 
-        # 如果检测到人体,获取人体关节点的坐标
-        if results.pose_landmarks:
-            # 获取当前帧中人体关节点的相关坐标
-            landmark_coords = []
-            for _, landmark in enumerate(results.pose_landmarks.landmark):
-                landmark_coords.append([landmark.x, landmark.y, landmark.z, landmark.visibility])
+# 左右对称关节的关键点索引及对应的水平距离阈值(像素)
+JOINT_NAMES = ['shoulder', 'elbow', 'wrist', 'hip', 'knee', 'ankle']
+LEFT_IDX = np.array([11, 13, 15, 23, 25, 27])
+RIGHT_IDX = np.array([12, 14, 16, 24, 26, 28])
+THR = np.array([30, 20, 15, 30, 20, 15])
 
-            # 将当前人体坐标添加到总坐标列表中
-            coords.append(landmark_coords)
 
-            # 根据坐标列表判断姿势
-            check_pose(coords)
+# 定义运动姿势判断函数
+# 关节点 x 坐标是按帧宽归一化的,乘以帧宽换算成像素后再与阈值比较
+def check_pose(cur, frame_width, debug=DEBUG):
+    # 一次性比较所有左右关节的水平距离，返回每个关节是否超出阈值
+    flags = np.abs(cur[LEFT_IDX, 0] - cur[RIGHT_IDX, 0]) * frame_width > THR
+    if debug:
+        for name, flag in zip(JOINT_NAMES, flags):
+            if not flag:
+                print(f'{name.capitalize()}距离正常')
+    return flags
 
-            # 计算移动距离
-            distance = calculate_distance(coords)
-            print(f'移动距离: {distance}')
 
-            # 显示当前帧并标注关键点
-            mp_pose.draw_landmarks(
-                frame,
-                results.pose_landmarks,
-                mp_pose.POSE_CONNECTIONS
-            )
+# 计算运动员移动距离
+# 直接对标量做运算,避免为两个关节点创建临时数组
+def calculate_distance(prev, cur):
+    dx = 0.5 * float(cur[23, 0] + cur[24, 0] - prev[23, 0] - prev[24, 0])
+    dy = 0.5 * float(cur[23, 1] + cur[24, 1] - prev[23, 1] - prev[24, 1])
+    return math.hypot(dx, dy)
+
+
+# 送入姿势检测前帧的最大边长;模型内部以 256x256 推理,更大的输入只会增加预处理开销
+MAX_SIDE = 640
+
+
+# 按长边缩小到 MAX_SIDE 以内。关节点坐标是归一化的,缩放后无需换算回原分辨率
+def downscale(frame):
+    h, w = frame.shape[:2]
+    scale = MAX_SIDE / max(h, w)
+    if scale < 1:
+        return cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+# 骨骼连线的关键点索引对,形状为 (K, 2)
+CONNECTIONS = np.array(sorted(mp_pose.POSE_CONNECTIONS), dtype=np.int32)
+
+
+# 可见度低于该值的关节点不绘制,与 MediaPipe drawing_utils 一致
+VISIBILITY_THRESHOLD = 0.5
+
+
+# 在帧上标注骨骼连线和关键点,坐标换算一次完成,跳过被遮挡的关节点
+def draw_skeleton(frame, landmarks, visibility):
+    h, w = frame.shape[:2]
+    pts = (landmarks * (w, h)).astype(np.int32)
+    visible = visibility >= VISIBILITY_THRESHOLD
+    # 两端都可见的连线打包成 (K, 2, 2) 一次绘制
+    connections = CONNECTIONS[visible[CONNECTIONS].all(axis=1)]
+    if len(connections):
+        cv2.polylines(frame, pts[connections], False, (255, 255, 255), 2)
+    for x, y in pts[visible].tolist():
+        cv2.circle(frame, (x, y), 3, (0, 0, 255), -1)
+
+
+# 放入一帧,队列满时等待检测线程取帧,同时响应退出信号
+def put_frame(item):
+    while not stop_event.is_set():
+        try:
+            frame_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+# 解码线程:按抽帧间隔解码视频帧并放入队列,视频结束或解码出错时放入 None
+# 帧解码到轮转复用的缓冲池中:队列最多 2 帧、检测线程持有 1 帧、解码线程写 1 帧,
+# 因此池中有 4 个缓冲区时,被覆盖的缓冲区一定已经处理完毕
+def decode_frames():
+    pool = [None] * (frame_queue.maxsize + 2)
+    slot = 0
+    try:
+        while not stop_event.is_set():
+            # 只对每 skip 帧中的最后一帧解码,其余帧仅 grab 跳过
+            ret = False
+            for _ in range(skip):
+                if not cap.grab():
+                    break
+            else:
+                # 尺寸一致时 OpenCV 直接写入已有缓冲区,首轮由 OpenCV 分配
+                ret, frame = cap.retrieve(pool[slot])
+            if not ret:
+                break
+
+            pool[slot] = frame
+            slot = (slot + 1) % len(pool)
+            put_frame(frame)
+    finally:
+        # 无论正常结束还是出错,都通知检测线程结束,避免其永远阻塞在 get()
+        put_frame(None)
+
+
+# 解码与姿势检测流水线并行:解码下一帧的同时检测当前帧
+frame_queue = queue.Queue(maxsize=2)
+stop_event = threading.Event()
+decoder = threading.Thread(target=decode_frames, daemon=True)
+decoder.start()
+
+# 复用的 RGB 缓冲区,首帧时按尺寸分配
+rgb = None
 
-        # 显示图像
+# 循环检测视频中的每一帧
+while True:
+    # 读取帧
+    frame = frame_queue.get()
+
+    # 如果读取帧失败,说明视频已结束
+    if frame is None:
+        break
+
+    # 将当前帧缩小并转为 RGB 后发送到Pose检测模型,显示仍使用原始帧
+    small = downscale(frame)
+    if rgb is None or rgb.shape != small.shape:
+        rgb = np.empty_like(small)
+    rgb.flags.writeable = True
+    cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=rgb)
+    # 标记为只读,MediaPipe 会直接引用该缓冲区而不再复制一份
+    rgb.flags.writeable = False
+    results = pose.process(rgb)
+
+    # 如果检测到人体,获取人体关节点的坐标
+    if results.pose_landmarks:
+        # 将当前帧中人体关节点的 (x, y) 坐标写入缓冲区
+        lms = results.pose_landmarks.landmark
+        for i in range(NUM_LANDMARKS):
+            cur[i, 0] = lms[i].x
+            cur[i, 1] = lms[i].y
+            vis[i] = lms[i].visibility
+
+        # 根据当前帧坐标判断姿势,输出不标准的关节
+        flags = check_pose(cur, frame.shape[1])
+        for name, flag in zip(JOINT_NAMES, flags):
+            if flag:
+                print(f'{name.capitalize()}距离过大，姿势不标准')
+
+        # 计算移动距离
+        distance = calculate_distance(prev, cur) if has_prev else 0
+        print(f'移动距离: {distance}')
+
+        # 显示当前帧并标注关键点
+        if SHOW_WINDOW:
+            draw_skeleton(frame, cur, vis)
+
+        # 当前帧变为上一帧,复用旧缓冲区存放下一帧
+        prev, cur = cur, prev
+        has_prev = True
+
+    # 显示图像,如果q键被按下,退出循环
+    # waitKey 只需处理窗口事件,等待 1ms 即可,不必阻塞检测线程
+    if SHOW_WINDOW:
         cv2.imshow('MediaPipe Pose', frame)
-
-        # 如果q键被按下,退出循环
-        if cv2.waitKey(10) & 0xFF == ord('q'):
+        if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-        # 增加帧计数器
-        counter += 1
+    # 增加帧计数器
+    counter += 1
 
-# 释放资源
+# 停止解码线程并释放资源
+stop_event.set()
+decoder.join()
 cap.release()
-cv2.destroyAllWindows()
+if SHOW_WINDOW:
+    cv2.destroyAllWindows()
@@ -2,81 +2,188 @@ from selenium import webdriver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException
 
-from bs4 import BeautifulSoup
+from lxml import html as lxhtml
+from lxml.cssselect import CSSSelector
 import requests
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 # 如果使用的是Chrome无头浏览器
 options = webdriver.ChromeOptions()
 options.add_argument('headless')
 options.add_argument('window-size=1200x600')  # Optional
 
-driver = webdriver.Chrome(chrome_options=options)
+# 目录列表项和文章段落的选择器
+LIST_SEL = (By.CSS_SELECTOR, "taro-view-core.catalogue-list-item.hydrated")
+ARTICLE_SEL = (By.CSS_SELECTOR, "taro-view-core.book-article-paragraph.hydrated")
+WAIT_TIMEOUT = 10
 
+# 并发抓取的线程数,每个线程持有一个浏览器,不宜过多
+MAX_WORKERS = 4
 
-#执行到64的时候出错了，不知道原因
-for idxDoc in range(199,300):
+# 每个线程独立的浏览器和连接,WebDriver 和 Session 都不是线程安全的
+local = threading.local()
+drivers = []
+drivers_lock = threading.Lock()
+
+
+# 获取当前线程的浏览器,首次使用时创建
+def get_driver():
+    if not hasattr(local, 'driver'):
+        driver = webdriver.Chrome(chrome_options=options)
+        # 创建后立即登记,即使后续预热失败也能在退出时关闭浏览器
+        with drivers_lock:
+            drivers.append(driver)
+        local.driver = driver
+        # 不使用隐式等待,统一由 WebDriverWait 显式等待,避免两种等待叠加
+        driver.implicitly_wait(0)
+        # 预先访问一次站点根目录,后续页面复用浏览器的连接和缓存
+        driver.get("https://h5.40dhjen.cn/")
+    return local.driver
+
+
+# 获取当前线程的连接,复用同一个连接探测页面和请求文章
+def get_session():
+    if not hasattr(local, 'sess'):
+        local.sess = requests.Session()
+    return local.sess
+
+
+# 从目录项中提取文章链接,没有链接的目录项为 None
+ARTICLE_URLS_JS = (
+    "return Array.from(document.querySelectorAll('" + LIST_SEL[1] + "'),"
+    " e => { const a = e.closest('a') || e.querySelector('a'); return a ? a.href : (e.dataset.url || null); })"
+)
+
+
+# 预编译文章段落选择器,避免每个页面重复解析 CSS
+PARAGRAPH_SELECTOR = CSSSelector(ARTICLE_SEL[1], translator='html')
+# 服务端返回的静态 HTML 未经浏览器 hydrate,不带 .hydrated 类
+STATIC_PARAGRAPH_SELECTOR = CSSSelector(ARTICLE_SEL[1].replace('.hydrated', ''), translator='html')
+
+# 浏览器返回的 page_source 是 str,统一编码为 UTF-8 字节后按 UTF-8 解析
+UTF8_PARSER = lxhtml.HTMLParser(encoding='utf-8')
+
+
+# 从页面 HTML 字节中提取文章段落文本
+# 传入 str 时,带 XML 编码声明的页面会让 lxml 抛出 ValueError,因此只接受 bytes
+def parse_paragraphs(html, selector=PARAGRAPH_SELECTOR, parser=None):
+    if not html.strip():
+        return []
+    tree = lxhtml.fromstring(html, parser=parser)
+    return [paragraph.text_content() for paragraph in selector(tree)]
+
+
+# 直接请求文章页面,内容由 JS 渲染时返回空列表
+def fetch_article(url):
+    try:
+        response = get_session().get(url, timeout=10)
+    except requests.RequestException:
+        return []
+    if response.status_code != 200:
+        return []
+    # 响应头声明了字符集时按其解码;否则传入原始字节由 lxml 按页面 <meta charset> 识别。
+    # 不能直接用 response.text:响应头没有字符集时 requests 会按 ISO-8859-1 解码中文
+    parser = None
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        parser = lxhtml.HTMLParser(encoding=response.encoding)
+    return parse_paragraphs(response.content, STATIC_PARAGRAPH_SELECTOR, parser)
+
+
+# 将文章段落一次性写入文件
+def save_article(filename, texts):
+    Path(filename).write_text(''.join(text + '\n' for text in texts), encoding='utf-8')
+
+
+# 返回目录页并等待目录列表重新显示,返回列表元素
+# history.back() 不等待跳转完成,且单页应用打开文章时目录节点仍留在 DOM 中(处于隐藏状态),
+# 因此先等地址回到目录页,再等列表项可见
+def back_to_catalogue(driver):
+    driver.execute_script("history.back()")
+    wait = WebDriverWait(driver, WAIT_TIMEOUT)
+    wait.until(EC.url_contains("catalogue"))
+    return wait.until(EC.visibility_of_all_elements_located(LIST_SEL))
+
+
+# 抓取一个目录下的所有文章
+def scrape_doc(idxDoc):
     sUrl = f"https://h5.40dhjen.cn/catalogue?id={idxDoc}"
-    response = requests.get(sUrl)
+    # 只需要状态码,用 HEAD 请求;服务器不支持 HEAD 时再用 GET
+    sess = get_session()
+    response = sess.head(sUrl, allow_redirects=True, timeout=5)
+    if response.status_code == 405:
+        response = sess.get(sUrl, timeout=5)
     #页面不存在跳过
     if response.status_code == 404:
         print(sUrl,"不存在")
-        continue
+        return
 
+    driver = get_driver()
     driver.get(response.url)
-    driver.implicitly_wait(20) 
     try:
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "taro-view-core.catalogue-list-item.hydrated"))
-        )
+        taro_views = WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_all_elements_located(LIST_SEL))
     except TimeoutException as e:
         print(sUrl,"没有获取成功")
-        continue
-    taro_views = driver.find_elements(By.CSS_SELECTOR, 'taro-view-core.catalogue-list-item.hydrated')
+        return
     raro_size = len(taro_views)
     title = driver.title
 
     print("当前循环索引：",idxDoc, "\n文件数量:",raro_size,"文章名：",title)
 
+    article_urls = driver.execute_script(ARTICLE_URLS_JS)
+    # 同一目录下的文章渲染方式相同,直接请求一次失败后其余文章都改用浏览器
+    use_http = True
+
     for idx in range(0,raro_size):
         txt = taro_views[idx].text
         print(f"文件名：{txt}")
+        filename = f"{title}{idx:03d}{txt}.md"
+
+        # 有文章链接时先直接请求,只有内容由 JS 渲染时才用浏览器点击进入
+        if use_http and idx < len(article_urls) and article_urls[idx]:
+            texts = fetch_article(article_urls[idx])
+            if texts:
+                save_article(filename, texts)
+                continue
+            use_http = False
 
         taro_views[idx].click()
 
-        driver.implicitly_wait(20)
         # 不是具体的页面跳过
         if "catalogue" in driver.current_url:
             break
-        
+
         try:
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "taro-view-core.book-article-paragraph.hydrated"))
-            )
+            WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located(ARTICLE_SEL))
         except TimeoutException as e:
             print(driver.current_url,"没有获取成功")
             # 返回原页面
-            driver.back()
-            driver.implicitly_wait(20)
-            taro_views = driver.find_elements(By.CSS_SELECTOR, 'taro-view-core.catalogue-list-item.hydrated')
+            taro_views = back_to_catalogue(driver)
             continue
 
-        filename = f"{title}{idx:03d}{txt}.md" 
-        # 获取新页面的内容
-        new_html = driver.page_source
-        new_soup = BeautifulSoup(new_html, 'html.parser')
-
-        # 提取book-article-paragraph类的元素并写入文件
-        paragraphs = new_soup.select('taro-view-core.book-article-paragraph.hydrated')
-        with open(filename, 'w', encoding='utf-8') as file:
-            for paragraph in paragraphs:
-                file.write(paragraph.text + '\n')
+        # 获取新页面的内容,提取book-article-paragraph类的元素并写入文件
+        save_article(filename, parse_paragraphs(driver.page_source.encode('utf-8'), parser=UTF8_PARSER))
 
         # 返回原页面
-        driver.back()
-        driver.implicitly_wait(20)
-        taro_views = driver.find_elements(By.CSS_SELECTOR, 'taro-view-core.catalogue-list-item.hydrated')
+        taro_views = back_to_catalogue(driver)
 
-driver.quit()
+
+#执行到64的时候出错了，不知道原因
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+try:
+    for future in [executor.submit(scrape_doc, idxDoc) for idxDoc in range(199,300)]:
+        try:
+            future.result()
+        except Exception as e:
+            print("抓取出错：", e)
+finally:
+    # 正常结束时所有任务都已完成;中断或出错时丢弃尚未开始的目录,只等待正在抓取的完成,
+    # 然后关闭所有浏览器
+    executor.shutdown(wait=True, cancel_futures=True)
+    for driver in drivers:
+        driver.quit()